@@ -1,42 +1,264 @@
+import asyncio
+import itertools
+import json
+import logging
 import time
 import os
+import queue
 import random
-import requests
-from typing import Callable, Any
-from web3 import Web3
-from web3.exceptions import TimeExhausted
+import sqlite3
+import aiohttp
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from decimal import Decimal
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from eth_account import Account
+from eth_keys.backends import get_backend
+from typing import Awaitable, Callable, Any, NamedTuple
+from web3 import AsyncWeb3, AsyncHTTPProvider, WebSocketProvider
+from web3.exceptions import (
+    ProviderConnectionError, TimeExhausted, Web3RPCError
+)
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used without it
+    orjson = None
+
+try:
+    from dotenv import load_dotenv
+except ImportError:  # optional; keys then come from the real environment or this file
+    load_dotenv = None
+
+if load_dotenv is not None:
+    load_dotenv()
 
 INI_CHAIN_RPC = "http://rpc-testnet.inichain.com"
-WALLET_ADDRESS_RAW = "REPLACE_WITH_YOUR_EVM_WALLET"
-PRIVATE_KEY = "REPLACE_WITH_YOUR_PRIVATE_KEY"
+# Optional WebSocket endpoint. When set, receipts are awaited on newHeads
+# notifications instead of fixed-interval polling.
+WS_URL = os.getenv("INI_CHAIN_WS", "")
+# Sent-but-unconfirmed txs are recorded here so a restart can pick them up.
+PENDING_DB = os.getenv("INI_PENDING_DB", os.path.expanduser("~/.inichain_bot/pending.db"))
+LOG_FILE = os.getenv("INI_LOG_FILE", "bot.log")
+LOG_LEVEL = os.getenv("LOGLEVEL", "INFO").upper()
+KEY_PLACEHOLDER = "REPLACE_WITH_YOUR_PRIVATE_KEY"
+
+# One entry per wallet; each runs its own swap loop and check-in timer, all
+# sharing one event loop and one HTTP connection pool. Put your key(s) here,
+# or leave this alone and set PRIVATE_KEYS / PRIVATE_KEY in the environment or
+# .env, which take precedence. Deleted as soon as the Wallet objects hold the
+# derived accounts.
+PRIVATE_KEYS = [KEY_PLACEHOLDER]
+
+def load_private_keys(in_file: list[str]) -> list[str]:
+    """
+    PRIVATE_KEYS (comma-separated) or PRIVATE_KEY from the environment / .env,
+    popped from os.environ as they're read; falls back to the in_file list.
+    Raises if that leaves nothing but the placeholder.
+    """
+    many, one = os.environ.pop("PRIVATE_KEYS", ""), os.environ.pop("PRIVATE_KEY", "")
+    keys = [key.strip() for key in (many or one).split(",") if key.strip()]
+    keys = keys or [key.strip() for key in in_file if key.strip()]
+    if all(key == KEY_PLACEHOLDER for key in keys):
+        raise Exception("No PRIVATE_KEYS found. Set PRIVATE_KEYS in your code or environment.")
+    return keys
 
-if not PRIVATE_KEY:
-    raise Exception("No PRIVATE_KEY found. Set PRIVATE_KEY in your code or environment.")
+PRIVATE_KEYS = load_private_keys(PRIVATE_KEYS)
 
-# We might keep a global reference to web3, but re-init on errors
-web3 = None
+log = logging.getLogger("inichain")
 
-def make_web3_provider() -> Web3:
-    """Creates a fresh Web3 instance with ~20s HTTP request timeout."""
-    return Web3(Web3.HTTPProvider(INI_CHAIN_RPC, request_kwargs={"timeout": 20}))
+# Private generator for swap amounts, sleeps and retry jitter, so nothing
+# else in the process drawing from (or seeding) the global one affects it.
+_rng = random.Random()
+
+def setup_logging() -> QueueListener:
+    """
+    Console plus a size-capped LOG_FILE (10 MB x 3 backups); called once from
+    __main__. Log calls only enqueue the record: the console and file writes
+    happen on the returned listener's thread, so a slow stdout or disk never
+    stalls the event loop. Stop the listener on exit to flush what's queued.
+    """
+    formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+    handlers = [
+        logging.StreamHandler(),
+        RotatingFileHandler(LOG_FILE, maxBytes=10_000_000, backupCount=3),
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    records = queue.SimpleQueue()
+    queue_handler = QueueHandler(records)
+    # QueueHandler pre-renders the message (and any traceback); the
+    # listener's handlers add the timestamp and level.
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=LOG_LEVEL, handlers=[queue_handler])
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+#############################################################################
+# 1. JSON codec + provider
+#############################################################################
+def json_dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+json_loads = orjson.loads if orjson is not None else json.loads
+
+def _orjson_default(obj):
+    # What web3's Web3JsonEncoder handles beyond plain JSON types
+    if isinstance(obj, (bytes, bytearray)):
+        return "0x" + bytes(obj).hex()
+    if hasattr(obj, "keys"):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class FastJSONProvider(AsyncHTTPProvider):
+    """AsyncHTTPProvider that encodes/decodes JSON-RPC payloads with orjson."""
+
+    @staticmethod
+    def encode_rpc_dict(rpc_dict) -> bytes:
+        try:
+            return orjson.dumps(rpc_dict, default=_orjson_default)
+        except TypeError:
+            # orjson.JSONEncodeError is a TypeError, e.g. for ints over 64 bits
+            return AsyncHTTPProvider.encode_rpc_dict(rpc_dict)
+
+    @staticmethod
+    def decode_rpc_response(raw_response: bytes):
+        return orjson.loads(raw_response)
+
+def make_web3_provider() -> AsyncWeb3:
+    """Creates a fresh AsyncWeb3 instance with ~20s HTTP request timeout."""
+    provider_cls = FastJSONProvider if orjson is not None else AsyncHTTPProvider
+    return AsyncWeb3(provider_cls(INI_CHAIN_RPC, request_kwargs={"timeout": 20}))
+
+# We might keep a global reference to web3, but re-init on errors.
+# Building the provider does no I/O; the connectivity check happens in init_web3().
+web3 = make_web3_provider()
+
+# Shared keep-alive HTTP session. It outlives provider re-inits so pooled
+# connections survive transient errors; it's only rebuilt after
+# MAX_CONNECTION_ERRORS connection errors in a row.
+http_session = None
+connection_errors = 0
+MAX_CONNECTION_ERRORS = 3
+
+async def get_http_session(force_new: bool = False) -> aiohttp.ClientSession:
+    global http_session
+    if force_new and http_session is not None:
+        await http_session.close()
+        http_session = None
+    if http_session is None or http_session.closed:
+        # web3's default session uses force_close=True, i.e. a new TCP connection per RPC
+        connector = aiohttp.TCPConnector(limit=16, limit_per_host=8, keepalive_timeout=60)
+        http_session = aiohttp.ClientSession(connector=connector, raise_for_status=True)
+    return http_session
 
 #############################################################################
 # 2. Re-init Web3 + Basic Checks
 #############################################################################
-def init_web3():
-    global web3
+async def init_web3(connection_error: bool = False, verify: bool = False):
+    """
+    (Re)creates web3 on the shared HTTP session. Only the startup call passes
+    verify=True; on reconnects the next real RPC surfaces any failure, which
+    saves a web3_clientVersion round trip per re-init.
+    A connection error on its own changes nothing: aiohttp has already dropped
+    the broken socket and the rest of the keep-alive pool is still warm. Only
+    MAX_CONNECTION_ERRORS in a row tear the session down.
+    """
+    global web3, connection_errors, CHAIN_ID, EIP1559
+    rebuild_session = False
+    if connection_error:
+        connection_errors += 1
+        if connection_errors < MAX_CONNECTION_ERRORS:
+            return
+        log.warning("[init_web3] Repeated connection errors, rebuilding HTTP session.")
+        connection_errors = 0
+        rebuild_session = True
+
     web3 = make_web3_provider()
-    if not web3.is_connected():
+    await web3.provider.cache_async_session(await get_http_session(force_new=rebuild_session))
+    if verify and not await web3.is_connected():
         raise Exception("Cannot connect to the IniChain testnet RPC.")
 
-# Initialize once at the start
-init_web3()
+    if CHAIN_ID is None:
+        CHAIN_ID, EIP1559 = await asyncio.gather(web3.eth.chain_id, has_base_fee())
+        build_tx_templates()
+
+# Fetched on the first init_web3() and put in every tx dict, so signing
+# never needs an eth_chainId lookup.
+CHAIN_ID = None
+# Also set on the first init_web3(): whether blocks carry a base fee, i.e.
+# txs are priced with maxFeePerGas/maxPriorityFeePerGas instead of gasPrice.
+EIP1559 = False
+
+#############################################################################
+# 2b. Direct JSON-RPC over the shared session
+#############################################################################
+# The hot-path calls (send raw tx, nonce, balances) skip web3's middleware
+# and result formatters and are POSTed straight to the node. RPC errors are
+# raised as Web3RPCError, same as web3 would.
+_rpc_ids = itertools.count()
+RPC_TIMEOUT = aiohttp.ClientTimeout(total=20)
+RPC_HEADERS = {"Content-Type": "application/json"}
+
+async def _post_rpc(payload):
+    session = await get_http_session()
+    async with session.post(
+        INI_CHAIN_RPC, data=json_dumps(payload), headers=RPC_HEADERS, timeout=RPC_TIMEOUT
+    ) as resp:
+        return json_loads(await resp.read())
+
+def _rpc_result(response: dict):
+    if "error" in response:
+        raise Web3RPCError(str(response["error"]), rpc_response=response)
+    return response["result"]
+
+async def raw_rpc(method: str, params: list):
+    payload = {"jsonrpc": "2.0", "id": next(_rpc_ids), "method": method, "params": params}
+    return _rpc_result(await _post_rpc(payload))
+
+class BatchRejectedError(Web3RPCError):
+    """The node answered a JSON-RPC batch with a single error object."""
+
+async def raw_rpc_batch(calls: list[tuple[str, list]]) -> list:
+    """Sends [(method, params), ...] as one JSON-RPC batch; results in call order."""
+    payload = [
+        {"jsonrpc": "2.0", "id": next(_rpc_ids), "method": method, "params": params}
+        for method, params in calls
+    ]
+    responses = await _post_rpc(payload)
+    if isinstance(responses, dict):
+        # The whole batch was rejected with a single error object
+        raise BatchRejectedError(str(responses.get("error")), rpc_response=responses)
+    by_id = {r.get("id"): r for r in responses}
+    return [_rpc_result(by_id[p["id"]]) for p in payload]
 
-WALLET_ADDRESS = web3.to_checksum_address(WALLET_ADDRESS_RAW)
 ROUTER_ADDRESS = web3.to_checksum_address("0x4ccB784744969D9B63C15cF07E622DDA65A88Ee7")
 USDT_ADDRESS   = web3.to_checksum_address("0xcF259Bca0315C6D32e877793B6a10e97e7647FdE")
 WINI_ADDRESS   = web3.to_checksum_address("0xfbECae21C91446f9c7b87E4e5869926998f99ffe")
 
+# Plain integer unit math; web3.to_wei/from_wei go through Decimal on every call.
+WEI_PER_ETH   = 10**18
+INV_WEI       = 1e-18  # balances are only logged, a multiply is all they need
+SWAP_DEADLINE_SECONDS = 300
+
+def to_wei(amount: float) -> int:
+    """
+    Exact wei for a decimal token amount (int(0.57 * 10**18) comes out 64 wei
+    short). Called once per swap, outside any retry loop.
+    """
+    return int(Decimal(str(amount)) * WEI_PER_ETH)
+GAS_PRICE_WEI = 10_000_000_000  # 10 gwei, floor for the suggested legacy gas price
+MAX_GAS_PRICE_WEI = 100_000_000_000  # 100 gwei, cap for any fee field, incl. bumps
+MIN_PRIORITY_FEE_WEI = 1_000_000_000  # 1 gwei, floor for the EIP-1559 tip
+FEE_HISTORY_BLOCKS = 4
+# Minimum % increase the node's txpool wants before it accepts a replacement
+# (geth's --txpool.pricebump, 10 by default).
+PRICE_BUMP_PCT = int(os.getenv("PRICE_BUMP_PCT", "10"))
+MIN_PRICE_BUMP_WEI = 1_000_000_000  # 1 gwei, smallest step any bump takes
+
 ROUTER_ABI = [
     {
         "name": "swapExactETHForTokens",
@@ -90,131 +312,593 @@ USDT_ABI = [
 #############################################################################
 # 3. Universal call_with_retries
 #############################################################################
-def call_with_retries(
-    func: Callable[..., Any],
+# Network-level failures: only these warrant rebuilding the web3 provider.
+# (ServerTimeoutError and ServerDisconnectedError are ClientConnectionErrors;
+# ClientPayloadError covers responses cut off mid-body.)
+CONNECTION_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+
+# JSON-RPC error codes worth retrying as-is: generic server error (incl.
+# "replacement transaction underpriced"), limit exceeded, internal error.
+RETRIABLE_CODES = frozenset({-32000, -32005, -32603})
+# Codes a node rejects a submitted tx with: geth's generic server error,
+# OpenEthereum/Nethermind's transaction error, internal error. Each covers
+# many reasons (insufficient funds too), so SEND_ERRORS tells them apart.
+# Nodes differ in the code they pick, so the message decides the kind; only a
+# fee bump, which costs real money, also needs one of these codes.
+TX_REJECTED_CODES = frozenset({-32000, -32010, -32603})
+SEND_ERRORS = (
+    ("nonce too low", 'nonce_too_low'),
+    ("nonce is too low", 'nonce_too_low'),
+    ("already known", 'already_known'),
+    ("already imported", 'already_known'),
+    ("underpriced", 'underpriced'),
+    ("gas price is too low", 'underpriced'),
+    ("less than block base fee", 'underpriced'),
+)
+
+def rpc_error(e: Exception) -> dict:
+    """
+    The JSON-RPC error object carried by e, or {} if there is none. Older web3
+    raises ValueError(error_dict); newer raises Web3RPCError with rpc_response.
+    """
+    data = e.args[0] if e.args else None
+    if isinstance(data, dict):
+        return data
+    response = getattr(e, "rpc_response", None)
+    if isinstance(response, dict) and isinstance(response.get("error"), dict):
+        return response["error"]
+    return {}
+
+def classify(e: Exception):
+    """The JSON-RPC error code carried by e, or None."""
+    return rpc_error(e).get('code')
+
+def send_error(e: Exception):
+    """
+    Why eth_sendRawTransaction was rejected, as a SEND_ERRORS kind, or None
+    for anything send_tx can't fix by itself (e.g. insufficient funds).
+    """
+    error = rpc_error(e)
+    message = error.get('message', '').lower()
+    for fragment, kind in SEND_ERRORS:
+        if fragment in message:
+            if kind == 'underpriced' and error.get('code') not in TX_REJECTED_CODES:
+                return None
+            return kind
+    return None
+
+# What call_with_retries does with each exception class (looked up along the
+# MRO, so subclasses inherit their parent's policy):
+#   'reinit'  - connection-level failure: re-init web3, back off, retry
+#   'backoff' - transient server-side failure (e.g. HTTP 5xx): back off, retry
+#   'inspect' - JSON-RPC error: retried only if its code is in RETRIABLE_CODES
+#               (or it has no code at all, e.g. a garbled response)
+# Anything else is a bug or a deterministic rejection and is raised at once.
+RETRYABLE = {
+    aiohttp.ClientConnectionError: 'reinit',
+    aiohttp.ClientPayloadError: 'reinit',
+    asyncio.TimeoutError: 'reinit',
+    aiohttp.ClientResponseError: 'backoff',
+    Web3RPCError: 'inspect',
+    ValueError: 'inspect',
+}
+MAX_RETRY_DELAY = 60.0
+
+def retry_policy(e: Exception):
+    for cls in type(e).__mro__:
+        if cls in RETRYABLE:
+            return RETRYABLE[cls]
+    return None
+
+def retry_delay(attempt: int, base: float) -> float:
+    """Exponential backoff from `base` seconds, capped, plus up to 1s of jitter."""
+    return min(MAX_RETRY_DELAY, base * 2 ** (attempt - 1)) + _rng.random()
+
+async def call_with_retries(
+    func: Callable[..., Awaitable[Any]],
     max_tries: int = 3,
     sleep_seconds: float = 5.0,
     reinit_on_error: bool = True,
     **kwargs
 ) -> Any:
     """
-    Calls func(**kwargs) with up to max_tries retries if we see:
-      - requests.exceptions.ConnectionError
-      - "replacement transaction underpriced"
-      - code': -32000
-    We also handle random ValueErrors and re-init web3 if desired.
+    Awaits func(**kwargs) with up to max_tries attempts, retrying according to
+    RETRYABLE with exponential backoff (sleep_seconds, 2x, 4x, ...) between
+    attempts. Transaction-specific errors such as an underpriced replacement
+    are left to send_tx().
     """
-    global web3
+    global connection_errors
     for attempt in range(1, max_tries + 1):
         try:
-            return func(**kwargs)
+            result = await func(**kwargs)
+            connection_errors = 0
+            return result
 
-        except requests.exceptions.ConnectionError as e:
-            print(f"[call_with_retries] Attempt {attempt} - ConnectionError: {e}")
-            if reinit_on_error:
-                print("[call_with_retries] Re-initializing web3 provider due to connection error.")
-                init_web3()
-            if attempt < max_tries:
-                time.sleep(sleep_seconds)
+        except Exception as e:
+            policy = retry_policy(e)
+            if policy == 'inspect':
+                code = classify(e)
+                if code is not None and code not in RETRIABLE_CODES:
+                    log.warning("[call_with_retries] Non-retriable RPC error %s: %s", code, e)
+                    raise
+                log.warning("[call_with_retries] Attempt %d - retriable RPC error %s: %s", attempt, code, e)
+            elif policy in ('reinit', 'backoff'):
+                log.warning("[call_with_retries] Attempt %d - %s: %r", attempt, type(e).__name__, e)
+                if policy == 'reinit' and reinit_on_error:
+                    await init_web3(connection_error=True)
             else:
                 raise
+            if attempt == max_tries:
+                raise
+            delay = retry_delay(attempt, sleep_seconds)
+            log.info("[call_with_retries] Retrying in %.1fs...", delay)
+            await asyncio.sleep(delay)
 
-        except ValueError as e:
-            msg = str(e)
-            if "replacement transaction underpriced" in msg or "code': -32000" in msg:
-                print("[call_with_retries] Caught 'replacement transaction underpriced'.")
-                if attempt < max_tries:
-                    print("[call_with_retries] Retry after sleeping 5s...")
-                    time.sleep(5)
-                else:
-                    raise
-            else:
-                print(f"[call_with_retries] Unhandled ValueError: {msg}")
-                if attempt < max_tries:
-                    time.sleep(sleep_seconds)
-                else:
-                    raise
+# HTTP error statuses, raised by the session (raise_for_status=True)
+HTTP_STATUS_ERRORS = (aiohttp.ClientResponseError,)
 
-        except Exception as e:
-            print(f"[call_with_retries] Unhandled error on attempt {attempt}: {e}")
-            if reinit_on_error:
-                init_web3()
-            if attempt < max_tries:
-                time.sleep(sleep_seconds)
-            else:
+async def poll_rpc(func: Callable[..., Awaitable[Any]], *args):
+    """
+    Awaits func(*args) for the receipt watchers' polling loops. A hosted RPC
+    answering 429 Too Many Requests is backed off exponentially and retried
+    instead of failing the whole wait; the caller's timeout still bounds it.
+    """
+    for attempt in itertools.count(1):
+        try:
+            return await func(*args)
+        except HTTP_STATUS_ERRORS as e:
+            if e.status != 429:
                 raise
+            delay = retry_delay(attempt, 1.0)
+            log.warning("[poll_rpc] Rate limited (429), backing off %.1fs.", delay)
+            await asyncio.sleep(delay)
 
 #############################################################################
 # 4. Extended wait_for_transaction_receipt with retry
 #############################################################################
-def wait_for_tx_receipt_with_retry(tx_hash, timeout=300, poll_latency=5, max_tries=2):
+class Receipt(NamedTuple):
+    """The receipt fields the bot reads, decoded from the raw JSON-RPC reply."""
+    transactionHash: bytes
+    blockNumber: int
+    status: int
+    gasUsed: int
+    effectiveGasPrice: int
+
+    @classmethod
+    def from_rpc(cls, r: dict) -> "Receipt":
+        return cls(
+            bytes.fromhex(r["transactionHash"][2:]),
+            int(r["blockNumber"], 16),
+            int(r["status"], 16),
+            int(r["gasUsed"], 16),
+            int(r["effectiveGasPrice"], 16),
+        )
+
+async def fetch_receipt(tx_hash, ws_web3=None):
+    """
+    The tx receipt, or None while the tx is still pending. Sent as a raw call
+    (over ws_web3's socket if given), skipping web3's receipt formatters.
+    """
+    params = ["0x" + tx_hash.hex()]
+    if ws_web3 is None:
+        result = await raw_rpc("eth_getTransactionReceipt", params)
+    else:
+        result = _rpc_result(await ws_web3.provider.make_request("eth_getTransactionReceipt", params))
+    return Receipt.from_rpc(result) if result is not None else None
+
+# Receipt waits are sized from the chain's own pace: an exponential moving
+# average of the block interval the watchers below observe. Until the first
+# interval is seen, RECEIPT_TIMEOUT and a 1s poll are used.
+RECEIPT_TIMEOUT = 60
+MIN_RECEIPT_TIMEOUT = 15
+BLOCK_TIME_SMOOTHING = 0.2
+avg_block_seconds = None
+
+def observe_block_interval(seconds: float):
+    global avg_block_seconds
+    if avg_block_seconds is None:
+        avg_block_seconds = seconds
+    else:
+        avg_block_seconds += BLOCK_TIME_SMOOTHING * (seconds - avg_block_seconds)
+
+def receipt_wait() -> tuple[float, float]:
+    """(timeout, poll_latency) for the next receipt wait."""
+    if avg_block_seconds is None:
+        return RECEIPT_TIMEOUT, 1
+    return max(MIN_RECEIPT_TIMEOUT, 6 * avg_block_seconds), max(0.5, avg_block_seconds / 2)
+
+def receipt_timeout(tx_hash, timeout) -> TimeExhausted:
+    return TimeExhausted(
+        f"Transaction 0x{tx_hash.hex()} is not in the chain after {timeout} seconds"
+    )
+
+async def wait_for_receipt_on_new_heads(tx_hash, timeout):
+    """
+    Subscribes to newHeads on WS_URL and checks for the receipt once per block,
+    returning the first receipt found. Raises TimeExhausted after `timeout`s.
+    """
+    async with AsyncWeb3(WebSocketProvider(WS_URL)) as ws_web3:
+        async def watch():
+            await ws_web3.eth.subscribe("newHeads")
+            # Timed from the subscription, so even a tx mined in the very next
+            # block contributes an interval sample.
+            last_block_at = time.monotonic()
+            # The tx may have been mined before the subscription went live.
+            receipt = await fetch_receipt(tx_hash, ws_web3)
+            if receipt is not None:
+                return receipt
+            async for _ in ws_web3.socket.process_subscriptions():
+                now = time.monotonic()
+                observe_block_interval(now - last_block_at)
+                last_block_at = now
+                receipt = await fetch_receipt(tx_hash, ws_web3)
+                if receipt is not None:
+                    return receipt
+
+        try:
+            return await asyncio.wait_for(watch(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise receipt_timeout(tx_hash, timeout)
+
+# Flipped off the first time the node refuses eth_newBlockFilter
+filters_supported = True
+
+async def wait_for_receipt_on_block_filter(tx_hash, timeout, poll_latency):
+    """
+    HTTP counterpart of wait_for_receipt_on_new_heads: polls a block filter,
+    whose eth_getFilterChanges reply is usually an empty list, and only asks
+    for the receipt once a new block has actually arrived. Falls back to
+    polling the receipt every poll_latency on nodes without filter support,
+    or once the node loses the filter (common behind load balancers).
+    """
+    global filters_supported
+    filter_id = None
+    # Timed from filter creation, like the newHeads watcher, so the first
+    # block the filter reports already yields an interval sample.
+    last_block_at = time.monotonic()
+    if filters_supported:
+        try:
+            filter_id = await raw_rpc("eth_newBlockFilter", [])
+            last_block_at = time.monotonic()
+        except Web3RPCError as e:
+            log.info("[wait_for_receipt_on_block_filter] Block filters unavailable (%s), polling receipts.", e)
+            filters_supported = False
+        except HTTP_STATUS_ERRORS as e:
+            # e.g. a 429; only this wait does without the filter
+            log.warning("[wait_for_receipt_on_block_filter] Couldn't create block filter (%s), polling receipts.", e)
+
+    async def watch():
+        nonlocal filter_id, last_block_at
+        receipt = await poll_rpc(fetch_receipt, tx_hash)
+        while receipt is None:
+            await asyncio.sleep(poll_latency)
+            if filter_id is None:
+                receipt = await poll_rpc(fetch_receipt, tx_hash)
+                continue
+            try:
+                new_blocks = await poll_rpc(raw_rpc, "eth_getFilterChanges", [filter_id])
+            except Web3RPCError as e:
+                log.info("[wait_for_receipt_on_block_filter] Block filter lost (%s), polling receipts.", e)
+                filter_id = None
+                continue
+            if new_blocks:
+                now = time.monotonic()
+                observe_block_interval((now - last_block_at) / len(new_blocks))
+                last_block_at = now
+                receipt = await poll_rpc(fetch_receipt, tx_hash)
+        return receipt
+
+    try:
+        return await asyncio.wait_for(watch(), timeout=timeout)
+    except asyncio.TimeoutError:
+        raise receipt_timeout(tx_hash, timeout)
+    finally:
+        if filter_id is not None:
+            try:
+                await raw_rpc("eth_uninstallFilter", [filter_id])
+            except (Web3RPCError, *CONNECTION_ERRORS, *HTTP_STATUS_ERRORS):
+                pass  # the node drops idle filters on its own
+
+async def wait_for_receipt(tx_hash, timeout=None, poll_latency=None):
+    """
+    One receipt wait: on newHeads when WS_URL is set and reachable, else on a
+    block filter. timeout / poll_latency default to what receipt_wait()
+    derives from the block time. Raises TimeExhausted, without logging it, so
+    a caller that expects timeouts can handle them quietly.
+    """
+    default_timeout, default_latency = receipt_wait()
+    timeout = timeout or default_timeout
+    poll_latency = poll_latency or default_latency
+    if WS_URL:
+        try:
+            return await wait_for_receipt_on_new_heads(tx_hash, timeout)
+        except (OSError, ProviderConnectionError) as e:
+            log.warning("[wait_for_receipt] WebSocket unavailable (%s), polling instead.", e)
+    return await wait_for_receipt_on_block_filter(tx_hash, timeout, poll_latency)
+
+async def wait_for_tx_receipt_with_retry(tx_hash, timeout=None, poll_latency=None, max_tries=2):
+    """wait_for_receipt, retried up to max_tries times."""
     for attempt in range(1, max_tries + 1):
         try:
-            receipt = web3.eth.wait_for_transaction_receipt(
-                tx_hash, timeout=timeout, poll_latency=poll_latency
-            )
-            return receipt
+            return await wait_for_receipt(tx_hash, timeout, poll_latency)
         except TimeExhausted:
-            print(f"[wait_for_tx_receipt_with_retry] Attempt {attempt}: timed out after {timeout}s.")
+            log.warning("[wait_for_tx_receipt_with_retry] Attempt %d: timed out after %.0fs.", attempt, timeout or receipt_wait()[0])
             if attempt < max_tries:
-                print("[wait_for_tx_receipt_with_retry] Retrying wait...")
+                log.info("[wait_for_tx_receipt_with_retry] Retrying wait...")
             else:
-                print("[wait_for_tx_receipt_with_retry] Max attempts reached, giving up.")
+                log.error("[wait_for_tx_receipt_with_retry] Max attempts reached, giving up.")
                 raise
 
 #############################################################################
 # 5. Simple Helpers for Router & USDT Contract
 #############################################################################
-def get_router_contract():
-    return web3.eth.contract(address=ROUTER_ADDRESS, abi=ROUTER_ABI)
+# Built once at import. They are only used to encode calldata offline, which
+# never touches the provider, so init_web3() doesn't need to re-bind them.
+ROUTER_CONTRACT = web3.eth.contract(address=ROUTER_ADDRESS, abi=ROUTER_ABI)
+USDT_CONTRACT = web3.eth.contract(address=USDT_ADDRESS, abi=USDT_ABI)
+
+#############################################################################
+# 5b. Pre-encoded calldata for swaps & approve
+#############################################################################
+# path and spender never change, so calldata is ABI-encoded once here with
+# the variable words zeroed; per tx we only splice in 32-byte words (`to`
+# being the sending wallet's address word).
+def u256(value: int) -> bytes:
+    return value.to_bytes(32, "big")
+
+def address_word(address: str) -> bytes:
+    return bytes.fromhex(address[2:]).rjust(32, b"\0")
+
+_ZERO_ADDRESS = "0x" + "00" * 20
+
+def encode_template(contract, fn_name, args) -> bytes:
+    return bytes.fromhex(contract.encode_abi(fn_name, args=args)[2:])
+
+# selector | amountOutMin | path offset | to | deadline | path...
+_ETH_FOR_TOKENS = encode_template(
+    ROUTER_CONTRACT, "swapExactETHForTokens", [0, [WINI_ADDRESS, USDT_ADDRESS], _ZERO_ADDRESS, 0]
+)
+_ETH_FOR_TOKENS_HEAD, _ETH_FOR_TOKENS_OFFSET, _ETH_FOR_TOKENS_TAIL = (
+    _ETH_FOR_TOKENS[:4], _ETH_FOR_TOKENS[36:68], _ETH_FOR_TOKENS[132:]
+)
+
+# selector | amountIn | amountOutMin | path offset | to | deadline | path...
+_TOKENS_FOR_ETH = encode_template(
+    ROUTER_CONTRACT, "swapExactTokensForETH", [0, 0, [USDT_ADDRESS, WINI_ADDRESS], _ZERO_ADDRESS, 0]
+)
+_TOKENS_FOR_ETH_HEAD, _TOKENS_FOR_ETH_OFFSET, _TOKENS_FOR_ETH_TAIL = (
+    _TOKENS_FOR_ETH[:4], _TOKENS_FOR_ETH[68:100], _TOKENS_FOR_ETH[164:]
+)
 
-def get_usdt_contract():
-    return web3.eth.contract(address=USDT_ADDRESS, abi=USDT_ABI)
+# selector | spender | value
+_APPROVE_HEAD = encode_template(USDT_CONTRACT, "approve", [ROUTER_ADDRESS, 0])[:36]
+
+# Constant fields of each tx kind, shared by all wallets ('from' is implied
+# by the signing key); builders only add nonce, fee fields, value and calldata.
+# Built by init_web3() as soon as CHAIN_ID is known.
+TX_TEMPLATES = {}
+
+def build_tx_templates():
+    base = {'chainId': CHAIN_ID, 'value': 0}
+    TX_TEMPLATES['approve'] = {**base, 'to': USDT_ADDRESS, 'gas': 100_000}
+    TX_TEMPLATES['swap'] = {**base, 'to': ROUTER_ADDRESS, 'gas': 300_000}
+    TX_TEMPLATES['checkin'] = {**base, 'to': CHECKIN_ADDRESS, 'gas': 120_000, 'data': CHECKIN_CALLDATA}
+
+def encode_swap_eth_for_tokens(to_word: bytes, min_out_wei: int, deadline: int) -> bytes:
+    return (_ETH_FOR_TOKENS_HEAD + u256(min_out_wei) + _ETH_FOR_TOKENS_OFFSET
+            + to_word + u256(deadline) + _ETH_FOR_TOKENS_TAIL)
+
+def encode_swap_tokens_for_eth(to_word: bytes, amount_in_wei: int, min_out_wei: int, deadline: int) -> bytes:
+    return (_TOKENS_FOR_ETH_HEAD + u256(amount_in_wei) + u256(min_out_wei)
+            + _TOKENS_FOR_ETH_OFFSET + to_word + u256(deadline) + _TOKENS_FOR_ETH_TAIL)
+
+def encode_approve(amount_wei: int) -> bytes:
+    return _APPROVE_HEAD + u256(amount_wei)
 
 #############################################################################
 # 6. Gas-bumping "send transaction" with call_with_retries
 #############################################################################
-def send_tx(tx_data, private_key, max_tries=3):
+# Signing is the one CPU-bound step per tx. eth_keys already signs through
+# libsecp256k1 when coincurve is installed and falls back to its pure-Python
+# backend otherwise; ECC_BACKEND_CLASS in the environment overrides the pick.
+SIGNING_BACKEND = type(get_backend()).__name__
+
+class Wallet:
+    """
+    Per-key state. web3, the HTTP pool, the gas cache and the calldata
+    templates are shared, so any number of wallets run side by side.
+    """
+    def __init__(self, private_key: str):
+        # Derived once; signing with it is pure CPU, no key parsing or RPC per tx.
+        self.account = Account.from_key(private_key)
+        self.address = self.account.address
+        self.tag = f"[{self.address[:8]}]"
+        self.address_word = address_word(self.address)
+        # eth_call params for USDT.balanceOf(address); the calldata never changes
+        self.balance_of_call = {
+            "to": USDT_ADDRESS,
+            "data": USDT_CONTRACT.encode_abi("balanceOf", args=[self.address]),
+        }
+        # This bot is the only sender for the address, so the nonce is tracked
+        # locally: seeded once by sync_nonce() and advanced after every
+        # successful send. We only go back to the node on a "nonce too low" error.
+        self.nonce = None
+        # Held across build + send_tx(), so the swap loop and the check-in task
+        # can't both be handed the same nonce.
+        self.nonce_lock = asyncio.Lock()
+
+WALLETS = [Wallet(key) for key in PRIVATE_KEYS]
+del PRIVATE_KEYS
+
+async def sync_nonce(wallet: Wallet):
+    async def do_get():
+        return int(await raw_rpc("eth_getTransactionCount", [wallet.address, "pending"]), 16)
+    wallet.nonce = await call_with_retries(func=do_get, max_tries=3)
+
+async def resync_nonce(wallet: Wallet):
+    """sync_nonce() for callers that aren't already inside a build + send."""
+    async with wallet.nonce_lock:
+        await sync_nonce(wallet)
+
+async def has_base_fee() -> bool:
+    """True if the chain is post-London, judged by the latest block's base fee."""
+    try:
+        history = await raw_rpc("eth_feeHistory", [hex(1), "latest", []])
+    except Web3RPCError:
+        return False
+    return any(int(fee, 16) for fee in history.get("baseFeePerGas") or [])
+
+def fee_query() -> tuple[str, list]:
+    """The one RPC call that prices a tx on this chain."""
+    if EIP1559:
+        return "eth_feeHistory", [hex(FEE_HISTORY_BLOCKS), "latest", [50]]
+    return "eth_gasPrice", []
+
+def fees_from(result) -> dict:
+    """
+    Tx fee fields from a fee_query() result. For EIP-1559 the tip is the
+    median of recent median tips (never below MIN_PRIORITY_FEE_WEI), and
+    maxFeePerGas leaves room for the base fee to double before the tx stalls.
+    """
+    if not EIP1559:
+        return {'gasPrice': min(max(int(result, 16), GAS_PRICE_WEI), MAX_GAS_PRICE_WEI)}
+    base_fee = int(result["baseFeePerGas"][-1], 16)  # the next block's
+    tips = sorted(int(reward[0], 16) for reward in result.get("reward") or [])
+    tip = max(tips[len(tips) // 2] if tips else 0, MIN_PRIORITY_FEE_WEI)
+    return {
+        'maxFeePerGas': min(2 * base_fee + tip, MAX_GAS_PRICE_WEI),
+        'maxPriorityFeePerGas': min(tip, MAX_GAS_PRICE_WEI),
+    }
+
+# The fee query is sent at most once per FEE_CACHE_TTL seconds.
+FEE_CACHE_TTL = 60
+_fee_cache = {'ts': 0.0, 'v': None}
+
+async def suggested_fees() -> dict:
+    """Fee fields for a new tx, cached for FEE_CACHE_TTL seconds."""
+    now = time.time()
+    if _fee_cache['v'] is None or now - _fee_cache['ts'] > FEE_CACHE_TTL:
+        store_fees(await raw_rpc(*fee_query()))
+    return _fee_cache['v']
+
+def store_fees(result):
+    """Refreshes the fee cache with a fee_query() result read elsewhere (e.g. in a batch)."""
+    _fee_cache['v'] = fees_from(result)
+    _fee_cache['ts'] = time.time()
+
+FEE_FIELDS = ('gasPrice', 'maxFeePerGas', 'maxPriorityFeePerGas')
+
+def price_bump(old_wei: int) -> int:
+    """
+    old_wei raised by PRICE_BUMP_PCT, rounded up so it never lands just short,
+    and by at least MIN_PRICE_BUMP_WEI so small fee fields (the 1 gwei tip)
+    move far enough to matter.
+    """
+    return max(-(-old_wei * (100 + PRICE_BUMP_PCT) // 100), old_wei + MIN_PRICE_BUMP_WEI)
+
+async def bumped_fees(old_fees: dict) -> dict:
+    """
+    Every fee field raised by the minimum accepted bump, or to its currently
+    suggested value if higher, capped at MAX_GAS_PRICE_WEI.
+    """
+    fresh = await suggested_fees()
+    return {
+        field: min(max(price_bump(old), fresh.get(field, 0)), MAX_GAS_PRICE_WEI)
+        for field, old in old_fees.items()
+    }
+
+async def send_tx(wallet: Wallet, tx_data, max_tries=3, replacing=False):
     """
     Signs and sends the transaction with up to `max_tries`.
-    If we get 'replacement transaction underpriced', we bump gas price by 20%.
+    If we get 'replacement transaction underpriced', we bump the fee fields by
+    PRICE_BUMP_PCT (or to the current suggested fees, if higher), capped at
+    MAX_GAS_PRICE_WEI, and resend right away.
+    On 'nonce too low' an earlier attempt that timed out may have been mined
+    after all, so its receipt is checked before the tx moves to a fresh nonce.
+    With replacing=True the tx re-sends a nonce already handed out: it never
+    moves to another nonce and wallet.nonce is left alone.
     We also handle connection errors, etc.
-    Returns tx_hash on success.
+    Returns (tx_hash, tx) on success, tx being what was finally signed.
     """
-    tx_local = tx_data.copy()
+    # Sent as-is on the common path; only copied if a retry must change it.
+    tx_local = tx_data
+    # Every version signed for the current nonce, in case one got through
+    attempts = {}
 
-    def do_send():
-        signed_tx = web3.eth.account.sign_transaction(tx_local, private_key)
-        tx_hash = web3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        return tx_hash
+    def mutable_tx():
+        nonlocal tx_local
+        if tx_local is tx_data:
+            tx_local = dict(tx_data)
+        return tx_local
+
+    async def do_send():
+        signed_tx = wallet.account.sign_transaction(tx_local)
+        attempts[bytes(signed_tx.hash)] = tx_local
+        try:
+            result = await raw_rpc("eth_sendRawTransaction", ["0x" + bytes(signed_tx.raw_transaction).hex()])
+        except Web3RPCError as e:
+            # A resend of this exact tx after its first response got lost:
+            # the node has it, so it counts as sent and the nonce is used.
+            if send_error(e) == 'already_known':
+                return bytes(signed_tx.hash)
+            raise
+        return bytes.fromhex(result[2:])
 
     for attempt in range(1, max_tries + 1):
         try:
-            return call_with_retries(func=do_send, max_tries=1)
-        except ValueError as e:
-            msg = str(e)
-            if "replacement transaction underpriced" in msg or "code': -32000" in msg:
-                old_gas = tx_local['gasPrice']
-                new_gas = int(old_gas * 1.2)
-                tx_local['gasPrice'] = new_gas
-                print(f"[send_tx] Bumped gas from {old_gas} -> {new_gas}")
+            tx_hash = await call_with_retries(func=do_send, max_tries=1, reinit_on_error=False)
+            if not replacing:
+                wallet.nonce = tx_local['nonce'] + 1
+            remember_pending(wallet, tx_local, tx_hash)
+            return tx_hash, tx_local
+        except (ValueError, Web3RPCError) as e:
+            kind = send_error(e)
+            if kind == 'nonce_too_low':
+                receipt = await call_with_retries(first_receipt, tx_hashes=list(attempts))
+                if receipt is not None:
+                    # The nonce was used up by one of our own earlier attempts
+                    tx_hash = receipt.transactionHash
+                    tx_local = attempts[tx_hash]
+                    log.info("%s[send_tx] Nonce %d already mined as 0x%s", wallet.tag, tx_local['nonce'], tx_hash.hex())
+                    if not replacing:
+                        wallet.nonce = tx_local['nonce'] + 1
+                    remember_pending(wallet, tx_local, tx_hash)
+                    return tx_hash, tx_local
+                if replacing:
+                    raise
+                await sync_nonce(wallet)
+                mutable_tx()['nonce'] = wallet.nonce
+                attempts.clear()
+                log.warning("%s[send_tx] Nonce too low, resynced to %d", wallet.tag, tx_local['nonce'])
+                if attempt < max_tries:
+                    continue
+                else:
+                    raise
+            elif kind == 'underpriced':
+                old_fees = {field: tx_local[field] for field in FEE_FIELDS if field in tx_local}
+                new_fees = await bumped_fees(old_fees)
+                if any(new_fees[field] <= old for field, old in old_fees.items()):
+                    log.error("%s[send_tx] Fees already at cap (%s), giving up.", wallet.tag, old_fees)
+                    raise
+                mutable_tx().update(new_fees)
+                log.warning("%s[send_tx] Bumped fees from %s -> %s", wallet.tag, old_fees, new_fees)
+                # The bump is the fix, no need to wait before resending
                 if attempt < max_tries:
-                    time.sleep(5)
                     continue
                 else:
                     raise
             else:
-                print(f"[send_tx] Unhandled ValueError: {msg}")
+                log.warning("%s[send_tx] Unhandled error: %s", wallet.tag, e)
                 if attempt < max_tries:
-                    time.sleep(5)
+                    await asyncio.sleep(5)
                     continue
                 else:
                     raise
-        except requests.exceptions.ConnectionError as ce:
-            print(f"[send_tx] ConnectionError attempt {attempt}: {ce}")
-            init_web3()
+        except CONNECTION_ERRORS as ce:
+            log.warning("%s[send_tx] ConnectionError attempt %d: %r", wallet.tag, attempt, ce)
+            await init_web3(connection_error=True)
             if attempt < max_tries:
-                time.sleep(5)
+                await asyncio.sleep(5)
             else:
                 raise
 
@@ -222,120 +906,296 @@ def send_tx(tx_data, private_key, max_tries=3):
 
 
 #############################################################################
-# 7. Getting Balances (with call_with_retries)
+# 6b. Pending-tx store (survives restarts)
 #############################################################################
-def get_ini_balance() -> float:
-    def do_get():
-        balance_wei = web3.eth.get_balance(WALLET_ADDRESS)
-        return float(web3.from_wei(balance_wei, 'ether'))
-    return call_with_retries(func=do_get, max_tries=3)
-
-def get_usdt_balance() -> float:
-    usdt_c = get_usdt_contract()
-    def do_get():
-        bal_wei = usdt_c.functions.balanceOf(WALLET_ADDRESS).call()
-        return float(web3.from_wei(bal_wei, 'ether'))
-    return call_with_retries(func=do_get, max_tries=3)
+# One row per (wallet, nonce): written when the node accepts a tx, deleted once
+# its receipt is in. Whatever is left at startup was in flight when the
+# previous run died.
+STUCK_TX_SECONDS = 120
+_pending_db = None
+# Every SQLite call runs on this one thread, in submission order: commits (an
+# fsync each) never stall the event loop or a held nonce_lock, writes can be
+# queued without waiting on them, and a later read still sees them.
+_db_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pending-db")
+
+def pending_db() -> sqlite3.Connection:
+    global _pending_db
+    if _pending_db is None:
+        os.makedirs(os.path.dirname(PENDING_DB) or ".", exist_ok=True)
+        _pending_db = sqlite3.connect(PENDING_DB, check_same_thread=False)
+        _pending_db.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            "address TEXT, nonce INTEGER, tx_hash TEXT, tx TEXT, sent_at INTEGER, "
+            "PRIMARY KEY (address, nonce))"
+        )
+    return _pending_db
+
+def _log_db_error(future):
+    if future.exception() is not None:
+        log.error("[pending_db] Write failed: %s", future.exception())
+
+def _write_pending(sql: str, params: tuple):
+    with pending_db() as db:
+        db.execute(sql, params)
+
+def remember_pending(wallet: Wallet, tx: dict, tx_hash: bytes):
+    data = tx.get('data', b'')
+    if isinstance(data, (bytes, bytearray)):
+        data = "0x" + bytes(data).hex()
+    row = (wallet.address, tx['nonce'], "0x" + tx_hash.hex(),
+           json.dumps({**tx, 'data': data}), int(time.time()))
+    _db_thread.submit(
+        _write_pending, "INSERT OR REPLACE INTO pending VALUES (?, ?, ?, ?, ?)", row
+    ).add_done_callback(_log_db_error)
+
+def forget_pending(wallet: Wallet, nonce: int):
+    _db_thread.submit(
+        _write_pending, "DELETE FROM pending WHERE address = ? AND nonce = ?", (wallet.address, nonce)
+    ).add_done_callback(_log_db_error)
+
+def _has_pending(address: str) -> bool:
+    return pending_db().execute("SELECT 1 FROM pending WHERE address = ?", (address,)).fetchone() is not None
+
+def _unmined_pending(address: str, mined: int) -> list:
+    db = pending_db()
+    with db:
+        db.execute("DELETE FROM pending WHERE address = ? AND nonce < ?", (address, mined))
+    return db.execute(
+        "SELECT nonce, tx_hash, tx, sent_at FROM pending WHERE address = ? ORDER BY nonce",
+        (address,),
+    ).fetchall()
+
+async def read_pending(func, *args):
+    """Runs one of the readers above on the DB thread, after any queued writes."""
+    return await asyncio.get_running_loop().run_in_executor(_db_thread, func, *args)
+
+async def replace_stuck_tx(wallet: Wallet, tx: dict):
+    """
+    Re-sends tx on its own nonce with bumped fees through send_tx(), which
+    records the replacement. Returns its (tx_hash, tx), or None if the nonce
+    is already used up, i.e. an earlier version of the tx was mined after all.
+    """
+    new_tx = {**tx, **await bumped_fees({field: tx[field] for field in FEE_FIELDS if field in tx})}
+    try:
+        tx_hash, new_tx = await send_tx(wallet, new_tx, replacing=True)
+    except (ValueError, Web3RPCError) as e:
+        if send_error(e) == 'nonce_too_low':
+            return None
+        raise
+    log.info("%s[replace_stuck_tx] Nonce %d re-sent with bumped fees: 0x%s", wallet.tag, tx['nonce'], tx_hash.hex())
+    return tx_hash, new_tx
+
+# A tx not mined within the receipt wait is replaced rather than waited on.
+MAX_REPLACEMENTS = 2
+
+async def confirm_tx(wallet: Wallet, tx: dict, tx_hash: bytes, timeout: float | None = None):
+    """
+    Waits up to `timeout`s (by default ~6 block intervals, see receipt_wait)
+    for the receipt. A tx still unmined by then is most likely underpriced, so
+    instead of polling longer it is replaced by a fee-bumped copy on the same
+    nonce (up to MAX_REPLACEMENTS times) and the wait restarts on the
+    replacement. Drops the nonce from the pending store once mined.
+    """
+    sent = [tx_hash]
+    for replacements in range(MAX_REPLACEMENTS + 1):
+        try:
+            receipt = await wait_for_receipt(tx_hash, timeout=timeout)
+            break
+        except TimeExhausted as e:
+            if replacements < MAX_REPLACEMENTS:
+                log.info("%s[confirm_tx] %s; replacing it.", wallet.tag, e)
+            else:
+                # Any earlier version may have been mined in the meantime
+                receipt = await first_receipt(sent)
+                if receipt is None:
+                    raise
+                break
+        try:
+            replacement = await replace_stuck_tx(wallet, tx)
+        except (ValueError, Web3RPCError) as e:
+            if send_error(e) != 'underpriced':
+                raise
+            # Fees can't go any higher; keep waiting on what was sent
+            log.warning("%s[confirm_tx] Nonce %d can't be outbid further: %s", wallet.tag, tx['nonce'], e)
+            continue
+        if replacement is None:
+            receipt = await first_receipt(sent)
+            if receipt is None:
+                raise TimeExhausted(f"Nonce {tx['nonce']} was taken by a tx this bot didn't send")
+            break
+        tx_hash, tx = replacement
+        sent.append(tx_hash)
+    forget_pending(wallet, tx['nonce'])
+    return receipt
+
+async def first_receipt(tx_hashes):
+    """The receipt of whichever of tx_hashes was mined, or None."""
+    for tx_hash in tx_hashes:
+        receipt = await fetch_receipt(tx_hash)
+        if receipt is not None:
+            return receipt
+    return None
+
+async def resume_pending(wallet: Wallet):
+    """
+    Picks up txs left in flight by a previous run. Rows whose nonce has been
+    mined since are dropped; a tx still pending after STUCK_TX_SECONDS is
+    replaced with bumped fees right away, and a swap past its deadline by a
+    0-value self-transfer on the same nonce. Each survivor is then confirmed,
+    so the swap loop starts from a clean slate.
+    """
+    if not await read_pending(_has_pending, wallet.address):
+        return
+
+    async def do_get():
+        return int(await raw_rpc("eth_getTransactionCount", [wallet.address, "latest"]), 16)
+    mined = await call_with_retries(func=do_get, max_tries=3)
+    rows = await read_pending(_unmined_pending, wallet.address, mined)
+
+    for nonce, tx_hash_hex, tx_json, sent_at in rows:
+        tx = json.loads(tx_json)
+        tx_hash = bytes.fromhex(tx_hash_hex[2:])
+        log.info("%s[resume_pending] Nonce %d still pending: %s", wallet.tag, nonce, tx_hash_hex)
+        try:
+            age = time.time() - sent_at
+            replacement = None
+            if tx['to'] == ROUTER_ADDRESS and age > SWAP_DEADLINE_SECONDS:
+                # Past its deadline the swap can only revert; a 0-value
+                # self-transfer frees the nonce for the cost of a plain transfer.
+                log.info("%s[resume_pending] Swap on nonce %d expired, cancelling it.", wallet.tag, nonce)
+                replacement = await replace_stuck_tx(
+                    wallet, {**tx, 'to': wallet.address, 'value': 0, 'data': b'', 'gas': 21_000}
+                )
+            elif age > STUCK_TX_SECONDS:
+                replacement = await replace_stuck_tx(wallet, tx)
+            if replacement is not None:
+                tx_hash, tx = replacement
+            await confirm_tx(wallet, tx, tx_hash)
+        except (TimeExhausted, Web3RPCError, *CONNECTION_ERRORS, *HTTP_STATUS_ERRORS) as e:
+            log.warning("%s[resume_pending] Nonce %d unresolved (%s), keeping it for next start.", wallet.tag, nonce, e)
 
 #############################################################################
-# 8. Approve USDT
+# 7. Getting Balances (with call_with_retries)
 #############################################################################
-def approve_usdt(spend_amount_wei: int):
-    usdt_c = get_usdt_contract()
-    def do_build():
-        nonce = web3.eth.get_transaction_count(WALLET_ADDRESS)
-        return usdt_c.functions.approve(ROUTER_ADDRESS, spend_amount_wei).build_transaction({
-            'from': WALLET_ADDRESS,
-            'gas': 100_000,
-            'gasPrice': web3.to_wei('10', 'gwei'),
-            'nonce': nonce
-        })
-
-    tx_data = call_with_retries(do_build)
-    tx_hash = send_tx(tx_data, PRIVATE_KEY, max_tries=3)
-    print("[approve_usdt] TX hash:", tx_hash.hex())
-
-    receipt = wait_for_tx_receipt_with_retry(tx_hash, timeout=300, poll_latency=5)
-    print(f"[approve_usdt] Confirmed in block: {receipt.blockNumber}\n")
+# Flipped off the first time the node rejects a batch request
+batching_supported = True
+
+async def get_balances(wallet: Wallet, with_fees: bool = False) -> tuple[float, float]:
+    """
+    Fetches (INI, USDT) balances in one JSON-RPC batch, i.e. a single HTTP
+    POST. With with_fees, the fee query rides along in the same batch, so a
+    swap built right after this read finds the fee cache fresh; reads followed
+    by a sleep longer than FEE_CACHE_TTL leave it out. If the node doesn't
+    accept batches, the reads are sent as concurrent single calls instead,
+    which still costs only one round trip.
+    """
+    async def do_get():
+        global batching_supported
+        calls = [
+            ("eth_getBalance", [wallet.address, "latest"]),
+            ("eth_call", [wallet.balance_of_call, "latest"]),
+        ]
+        if with_fees:
+            calls.append(fee_query())
+        if batching_supported:
+            try:
+                results = await raw_rpc_batch(calls)
+            except BatchRejectedError as e:
+                log.info("[get_balances] Batch request rejected (%s), using concurrent calls.", e)
+                batching_supported = False
+        if not batching_supported:
+            results = await asyncio.gather(*(raw_rpc(m, p) for m, p in calls))
+        ini_hex, usdt_hex = results[:2]
+        if with_fees:
+            store_fees(results[2])
+        return int(ini_hex, 16) * INV_WEI, int(usdt_hex, 16) * INV_WEI
+    return await call_with_retries(func=do_get, max_tries=3)
+
+async def report_balances_while_sleeping(wallet: Wallet, label: str, seconds: float) -> tuple[float, float]:
+    """
+    Fetches and prints balances concurrently with an idle sleep, so the RPC
+    round trip is hidden inside the sleep instead of added on top of it.
+    """
+    async def report():
+        ini_balance, usdt_balance = await get_balances(wallet)
+        log.info("%s %s: %.4f INI, %.4f USDT", wallet.tag, label, ini_balance, usdt_balance)
+        return ini_balance, usdt_balance
+
+    balances, _ = await asyncio.gather(report(), asyncio.sleep(seconds))
+    return balances
 
 #############################################################################
-# 9. Swap: INI -> USDT
+# 8. Approve USDT
 #############################################################################
-def swap_ini_to_usdt(ini_amount_in_ether, min_out_wei=0):
-    print("[swap_ini_to_usdt] swapping", ini_amount_in_ether, "INI -> USDT")
-
-    router_c = get_router_contract()
-    def do_build():
-        path = [WINI_ADDRESS, USDT_ADDRESS]
-        amount_in_wei = web3.to_wei(ini_amount_in_ether, 'ether')
-        deadline = int(time.time()) + 300
-        nonce = web3.eth.get_transaction_count(WALLET_ADDRESS)
-        return router_c.functions.swapExactETHForTokens(
-            min_out_wei,
-            path,
-            WALLET_ADDRESS,
-            deadline
-        ).build_transaction({
-            'from': WALLET_ADDRESS,
-            'value': amount_in_wei,
-            'gas': 300_000,
-            'gasPrice': web3.to_wei('10', 'gwei'),
-            'nonce': nonce
-        })
-
-    tx_data = call_with_retries(do_build, max_tries=3)
-    tx_hash = send_tx(tx_data, PRIVATE_KEY, max_tries=3)
-    print(f"[swap_ini_to_usdt] TX hash: {tx_hash.hex()}")
-
-    receipt = wait_for_tx_receipt_with_retry(tx_hash, timeout=300, poll_latency=5)
-    print(f"[swap_ini_to_usdt] Confirmed in block: {receipt.blockNumber}")
-
-    gas_used = receipt.gasUsed
-    final_gas_price = tx_data['gasPrice']
-    fee_wei = gas_used * final_gas_price
-    fee_ini = web3.from_wei(fee_wei, 'ether')
-    print(f"[swap_ini_to_usdt] Tx Fee: {fee_ini} INI\n")
+async def approve_usdt(wallet: Wallet, spend_amount_wei: int):
+    async def do_build():
+        return {
+            **TX_TEMPLATES['approve'],
+            'data': encode_approve(spend_amount_wei),
+            **await suggested_fees(),
+            'nonce': wallet.nonce
+        }
+
+    async with wallet.nonce_lock:
+        tx_data = await call_with_retries(do_build)
+        tx_hash, sent_tx = await send_tx(wallet, tx_data, max_tries=3)
+    log.info("%s[approve_usdt] TX hash: 0x%s", wallet.tag, tx_hash.hex())
+
+    receipt = await confirm_tx(wallet, sent_tx, tx_hash)
+    log.info("%s[approve_usdt] Confirmed in block: %d", wallet.tag, receipt.blockNumber)
 
 #############################################################################
-# 10. Swap: USDT -> INI
+# 9. Swaps: INI <-> USDT
 #############################################################################
-def swap_usdt_to_ini(usdt_amount_in_ether, min_out_wei=0):
-    print("[swap_usdt_to_ini] swapping", usdt_amount_in_ether, "USDT -> INI")
-
-    router_c = get_router_contract()
-    def do_build():
-        path = [USDT_ADDRESS, WINI_ADDRESS]
-        amount_in_wei = web3.to_wei(usdt_amount_in_ether, 'ether')
-        deadline = int(time.time()) + 300
-        nonce = web3.eth.get_transaction_count(WALLET_ADDRESS)
-        return router_c.functions.swapExactTokensForETH(
-            amount_in_wei,
-            min_out_wei,
-            path,
-            WALLET_ADDRESS,
-            deadline
-        ).build_transaction({
-            'from': WALLET_ADDRESS,
-            'gas': 300_000,
-            'gasPrice': web3.to_wei('10', 'gwei'),
-            'nonce': nonce
-        })
-
-    tx_data = call_with_retries(do_build, max_tries=3)
-    tx_hash = send_tx(tx_data, PRIVATE_KEY, max_tries=3)
-    print(f"[swap_usdt_to_ini] TX hash: {tx_hash.hex()}")
-
-    receipt = wait_for_tx_receipt_with_retry(tx_hash, timeout=300, poll_latency=5)
-    print(f"[swap_usdt_to_ini] Confirmed in block: {receipt.blockNumber}")
-
-    gas_used = receipt.gasUsed
-    final_gas_price = tx_data['gasPrice']
-    fee_wei = gas_used * final_gas_price
-    fee_ini = web3.from_wei(fee_wei, 'ether')
-    print(f"[swap_usdt_to_ini] Tx Fee: {fee_ini} INI\n")
+async def _swap(wallet: Wallet, label: str, value_wei: int, encode_data: Callable[[int], bytes], max_tries: int = 3):
+    """
+    Build, send and confirm path shared by both swap directions.
+    encode_data(deadline) returns the calldata; value_wei is the INI sent
+    along with the call (0 when selling USDT).
+    """
+    async def do_build():
+        deadline = time.time_ns() // 1_000_000_000 + SWAP_DEADLINE_SECONDS
+        return {
+            **TX_TEMPLATES['swap'],
+            'value': value_wei,
+            'data': encode_data(deadline),
+            **await suggested_fees(),
+            'nonce': wallet.nonce
+        }
+
+    async with wallet.nonce_lock:
+        tx_data = await call_with_retries(do_build, max_tries=max_tries)
+        tx_hash, sent_tx = await send_tx(wallet, tx_data, max_tries=max_tries)
+    log.info("%s[%s] TX hash: 0x%s", wallet.tag, label, tx_hash.hex())
+
+    receipt = await confirm_tx(wallet, sent_tx, tx_hash)
+    log.info("%s[%s] Confirmed in block: %d", wallet.tag, label, receipt.blockNumber)
+
+    # effectiveGasPrice is what was actually paid: the bumped price if send_tx
+    # had to resend, base fee + tip for EIP-1559 txs.
+    fee_wei = receipt.gasUsed * receipt.effectiveGasPrice
+    log.info("%s[%s] Tx Fee: %.6f INI", wallet.tag, label, fee_wei * INV_WEI)
+
+async def swap_ini_to_usdt(wallet: Wallet, ini_amount_in_ether, min_out_wei=0, max_tries=3):
+    log.info("%s[swap_ini_to_usdt] swapping %s INI -> USDT", wallet.tag, ini_amount_in_ether)
+    amount_in_wei = to_wei(ini_amount_in_ether)
+    await _swap(
+        wallet, "swap_ini_to_usdt", amount_in_wei,
+        lambda deadline: encode_swap_eth_for_tokens(wallet.address_word, min_out_wei, deadline),
+        max_tries,
+    )
+
+async def swap_usdt_to_ini(wallet: Wallet, usdt_amount_in_ether, min_out_wei=0, max_tries=3):
+    log.info("%s[swap_usdt_to_ini] swapping %s USDT -> INI", wallet.tag, usdt_amount_in_ether)
+    amount_in_wei = to_wei(usdt_amount_in_ether)
+    await _swap(
+        wallet, "swap_usdt_to_ini", 0,
+        lambda deadline: encode_swap_tokens_for_eth(wallet.address_word, amount_in_wei, min_out_wei, deadline),
+        max_tries,
+    )
 
 #############################################################################
-# 11. DAILY CHECK-IN CODE
+# 10. DAILY CHECK-IN CODE
 #############################################################################
 CHECKIN_ADDRESS = web3.to_checksum_address("0x73439c32e125B28139823fE9C6C079165E94C6D1")
 CHECKIN_ABI = [
@@ -394,113 +1254,152 @@ CHECKIN_ABI = [
     }
 ]
 
-# We'll track the last check-in time and the next random wait (in seconds).
-last_checkin_time = 0
-next_checkin_wait = 0
+# checkIn() takes no arguments, so its calldata is just the selector
+CHECKIN_CALLDATA = web3.eth.contract(address=CHECKIN_ADDRESS, abi=CHECKIN_ABI).encode_abi("checkIn")
 
-def daily_sign_in():
+async def daily_sign_in(wallet: Wallet):
     """Calls checkIn() on the CheckIn contract once."""
-    global web3
-    checkin_contract = web3.eth.contract(address=CHECKIN_ADDRESS, abi=CHECKIN_ABI)
-
-    print("[daily_sign_in] Attempting daily sign-in...")
+    log.info("%s[daily_sign_in] Attempting daily sign-in...", wallet.tag)
     try:
-        nonce = web3.eth.get_transaction_count(WALLET_ADDRESS, "pending")
-        tx = checkin_contract.functions.checkIn().build_transaction({
-            'from': WALLET_ADDRESS,
-            'gas': 120000,
-            'gasPrice': web3.to_wei('10', 'gwei'),
-            'nonce': nonce
-        })
-        tx_hash = send_tx(tx, PRIVATE_KEY, max_tries=3)
-        print(f"[daily_sign_in] Tx sent: {web3.to_hex(tx_hash)}")
-
-        receipt = wait_for_tx_receipt_with_retry(tx_hash, timeout=180, poll_latency=5)
+        async with wallet.nonce_lock:
+            tx = {
+                **TX_TEMPLATES['checkin'],
+                **await suggested_fees(),
+                'nonce': wallet.nonce
+            }
+            tx_hash, tx = await send_tx(wallet, tx, max_tries=3)
+        log.info("%s[daily_sign_in] Tx sent: 0x%s", wallet.tag, tx_hash.hex())
+
+        receipt = await confirm_tx(wallet, tx, tx_hash)
         if receipt.status == 1:
-            print(f"[daily_sign_in] Success! Confirmed in block: {receipt.blockNumber}")
+            log.info("%s[daily_sign_in] Success! Confirmed in block: %d", wallet.tag, receipt.blockNumber)
         else:
-            print("[daily_sign_in] Transaction failed or reverted.")
+            log.warning("%s[daily_sign_in] Transaction failed or reverted.", wallet.tag)
     except Exception as e:
-        print("[daily_sign_in] Error during sign-in:", e)
+        log.error("%s[daily_sign_in] Error during sign-in: %s", wallet.tag, e)
+
+async def schedule_checkins(wallet: Wallet):
+    """Runs alongside the swap loop: sign in now, then again on a random timer."""
+    await daily_sign_in(wallet)
+    # first follow-up after 4-5 hours (14400-18000s)
+    next_checkin_wait = _rng.randint(14400, 18000)
+    while True:
+        await asyncio.sleep(next_checkin_wait)
+        await daily_sign_in(wallet)
+        # random wait between 18 hours (64800s) and 22 hours (79200s)
+        next_checkin_wait = _rng.randint(64800, 79200)
 
 #############################################################################
-# 12. Main loop
+# 11. Main loop
 #############################################################################
-def main():
-    print("\n--- Bot for IniChain By Lazynode ---\n")
-    print("\n--- https://lazynode.xyz ---\n")
-
-    # ### DAILY CHECK-IN CODE ###
-    # On startup, we do an immediate sign in
-    global last_checkin_time, next_checkin_wait
-    daily_sign_in()
-    last_checkin_time = time.time()
-    # random wait between 18 hours (64800s) and 22 hours (79200s)
-    next_checkin_wait = random.randint(14400, 18000)
+@dataclass(frozen=True)
+class Config:
+    """Swap-cycle knobs shared by every wallet's loop; see main(cfg)."""
+    retries: int = 3                                     # send attempts per swap
+    swap_amount: tuple[float, float] = (0.2, 0.99)       # INI sold per cycle
+    sleep_between: tuple[int, int] = (220, 450)          # s between the two swaps
+    sleep_cycle: tuple[int, int] = (220, 450)            # s before the next cycle
+    min_ini_balance: float = 1.0                         # below this a cycle is skipped
+    low_balance_sleep: int = 300
+    usdt_reserve: float = 0.1                            # USDT kept back on the way back
+    min_usdt_swap: float = 0.2
 
+async def run_wallet(wallet: Wallet, cfg: Config):
+    """Swap loop for one wallet; supervise_wallet() sets it up and restarts it."""
     while True:
         try:
-            print("=== New Cycle ===")
-            current_time = time.time()
-
-            # ### DAILY CHECK-IN CODE ###
-            # check if it's time for next daily sign-in
-            if (current_time - last_checkin_time) > next_checkin_wait:
-                daily_sign_in()
-                last_checkin_time = current_time
-                next_checkin_wait = random.randint(64800, 79200)
+            log.info("%s === New Cycle ===", wallet.tag)
 
             # --- main logic continues ---
-            ini_balance = get_ini_balance()
-            usdt_balance = get_usdt_balance()
-            print(f"Balances: {ini_balance:.4f} INI, {usdt_balance:.4f} USDT")
-            sleep_cycle = random.randint(220,450)
-
-            if ini_balance < 1.0:
-                print("INI < 1.0, skip cycle.")
-                time.sleep(300)
+            # The first swap is built right after this read, so it fetches the fees too
+            ini_balance, usdt_balance = await get_balances(wallet, with_fees=True)
+            log.info("%s Balances: %.4f INI, %.4f USDT", wallet.tag, ini_balance, usdt_balance)
+
+            if ini_balance < cfg.min_ini_balance:
+                log.info("%s INI < %s, skip cycle.", wallet.tag, cfg.min_ini_balance)
+                await asyncio.sleep(cfg.low_balance_sleep)
                 continue
 
-            # random swap of 0.2..0.99
-            ini_to_swap = round(random.uniform(0.2, 0.99), 2)
+            ini_to_swap = round(_rng.uniform(*cfg.swap_amount), 2)
             try:
-                swap_ini_to_usdt(ini_to_swap)
+                await swap_ini_to_usdt(wallet, ini_to_swap, max_tries=cfg.retries)
             except Exception as e:
-                print("[main] swap_ini_to_usdt failed:", e)
-                time.sleep(10)
+                log.error("%s[main] swap_ini_to_usdt failed: %s", wallet.tag, e)
+                # The tx may never have made it into the pool; re-read the nonce
+                await resync_nonce(wallet)
+                await asyncio.sleep(10)
                 continue
 
-            ini_after = get_ini_balance()
-            usdt_after = get_usdt_balance()
-            print(f"After swap: {ini_after:.4f} INI, {usdt_after:.4f} USDT")
-
-            sleep_cycle = random.randint(220,450)
-            print(f"Sleeping {sleep_cycle} sec before second swap.")
-            time.sleep(sleep_cycle)
+            sleep_cycle = _rng.randint(*cfg.sleep_between)
+            log.info("%s Sleeping %d sec before second swap.", wallet.tag, sleep_cycle)
+            ini_after, usdt_after = await report_balances_while_sleeping(wallet, "After swap", sleep_cycle)
 
             # second swap
-            usdt_to_swap = usdt_after - 0.1
-            if usdt_to_swap < 0.2:
-                print("Not enough USDT to swap, skip second swap.")
+            usdt_to_swap = usdt_after - cfg.usdt_reserve
+            if usdt_to_swap < cfg.min_usdt_swap:
+                log.info("%s Not enough USDT to swap, skip second swap.", wallet.tag)
             else:
                 try:
-                    swap_usdt_to_ini(usdt_to_swap)
+                    await swap_usdt_to_ini(wallet, usdt_to_swap, max_tries=cfg.retries)
                 except Exception as e:
-                    print("[main] swap_usdt_to_ini failed:", e)
+                    log.error("%s[main] swap_usdt_to_ini failed: %s", wallet.tag, e)
+                    await resync_nonce(wallet)
 
-            final_ini = get_ini_balance()
-            final_usdt = get_usdt_balance()
-            print(f"Final Balances: {final_ini:.4f} INI, {final_usdt:.4f} USDT")
+            sleep_cycle = _rng.randint(*cfg.sleep_cycle)
+            log.info("%s Sleeping %ds before next cycle...", wallet.tag, sleep_cycle)
+            await report_balances_while_sleeping(wallet, "Final Balances", sleep_cycle)
+
+        except Exception as e:
+            log.exception("%s[main] Unexpected error in main loop: %s", wallet.tag, e)
+            await resync_nonce(wallet)
+            await asyncio.sleep(10)
 
-            sleep_cycle = random.randint(220,450)
-            print(f"Sleeping {sleep_cycle}s before next cycle...\n")
-            time.sleep(sleep_cycle)
+# A wallet whose loop dies (e.g. its resync fails mid-outage) is restarted on
+# its own after WALLET_RESTART_DELAY; the other wallets keep running.
+WALLET_RESTART_DELAY = 30
 
+async def supervise_wallet(wallet: Wallet, cfg: Config):
+    """
+    Startup (resume + nonce sync) and swap loop for one wallet, with its
+    check-ins on a timer alongside.
+    """
+    checkin_task = None
+    while True:
+        try:
+            await resume_pending(wallet)
+            await resync_nonce(wallet)
+            if checkin_task is None:
+                # ### DAILY CHECK-IN CODE ###
+                # Check-ins run on their own timer in the same event loop, so
+                # the swap cycle never has to check whether one is due. The
+                # task outlives loop restarts, so a restart doesn't sign in again.
+                checkin_task = asyncio.create_task(schedule_checkins(wallet))
+            await run_wallet(wallet, cfg)
         except Exception as e:
-            print("[main] Unexpected error in main loop:", e)
-            init_web3()
-            time.sleep(10)
+            log.exception("%s[supervise_wallet] Wallet loop died (%s), restarting in %ds.",
+                          wallet.tag, e, WALLET_RESTART_DELAY)
+            await asyncio.sleep(WALLET_RESTART_DELAY)
+
+
+async def main(cfg: Config = Config()):
+    log.info("--- Bot for IniChain By Lazynode ---")
+    log.info("--- https://lazynode.xyz ---")
+
+    # Initialize once at the start
+    await init_web3(verify=True)
+    if SIGNING_BACKEND == "NativeECCBackend":
+        log.warning("Signing with the pure-Python secp256k1 backend; `pip install coincurve` for the C one.")
+    else:
+        log.info("Signing backend: %s", SIGNING_BACKEND)
+
+    # Every wallet idles in asyncio.sleep() between swaps, so one process
+    # drives them all concurrently over the shared web3 and HTTP session.
+    await asyncio.gather(*(supervise_wallet(wallet, cfg) for wallet in WALLETS))
 
 
 if __name__ == "__main__":
-    main()
+    log_listener = setup_logging()
+    try:
+        asyncio.run(main())
+    finally:
+        log_listener.stop()